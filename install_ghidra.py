@@ -1,14 +1,26 @@
 import os
 import shutil
+import stat
 import subprocess
-import urllib.request
 import zipfile
 import tarfile
 import hashlib
+import argparse
+import asyncio
 import json
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import urllib3
 from colorama import Fore, Style, init
 from tqdm import tqdm
 
+try:
+    # ISA-L's SIMD inflate is several times faster than zlib on the JDK tarball
+    from isal import igzip
+except ImportError:
+    igzip = None
+
 # Initialize colorama
 init(autoreset=True)
 
@@ -43,10 +55,35 @@ cwd = os.getcwd()
 temp_dir = os.path.join(cwd, "ghidra_install")
 applet_path = os.path.join(temp_dir, "Ghidra-OSX-Launcher-Script.scpt")
 app_dir = os.path.join(temp_dir, "Ghidra.app")
-jdk_dir = os.path.join(temp_dir, "jdk")
-ghidra_dir = os.path.join(temp_dir, "ghidra")
+resources_dir = os.path.join(app_dir, "Contents", "Resources")
+# Kept outside the bundle so it does not add unsealed files to the app root
+applet_digest_path = os.path.join(temp_dir, ".applet.sha256")
 applications_dir = "/Applications"
 
+# I/O tuning
+HASH_CHUNK_SIZE = 1 << 20
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+COPY_BUFFER_SIZE = 1 << 20
+TAR_READ_BUFFER_SIZE = 1 << 20
+GRADLE_LOG_TAIL_LINES = 200
+RANGE_DOWNLOAD_SEGMENTS = 8
+RANGE_DOWNLOAD_MIN_SIZE = 16 << 20
+RANGE_SEGMENT_RETRIES = 5
+
+# Archives plus the extracted JDK and Ghidra trees, with some headroom for the Gradle build
+REQUIRED_FREE_BYTES = int(1.5 * 1024 ** 3)
+
+# Shared connection pool: keeps TLS sessions alive across range requests and re-downloads
+http = urllib3.PoolManager(
+    retries=urllib3.Retry(total=5, backoff_factor=1.0, status_forcelist=(500, 502, 503, 504)),
+    # A stalled read must not block cancellation forever
+    timeout=urllib3.Timeout(connect=30, read=60),
+    maxsize=RANGE_DOWNLOAD_SEGMENTS,
+)
+
+# Set when one install pipeline fails, so the other stops at its next chunk instead of running to completion
+install_cancelled = threading.Event()
+
 # Names
 launch_script_path = os.path.join(temp_dir,'Ghidra.app/Contents/Resources/ghidra/support/launch.sh')
 ghidra_run_path = os.path.join(temp_dir, 'Ghidra.app/Contents/Resources/ghidra/ghidraRun')
@@ -56,25 +93,68 @@ ghidra_run_path = os.path.join(temp_dir, 'Ghidra.app/Contents/Resources/ghidra/g
 os.makedirs(temp_dir, exist_ok=True)
 
 
+def check_cancelled():
+    """Abort the current download or extraction if another install step has failed"""
+    if install_cancelled.is_set():
+        raise Exception("Installation cancelled")
+
+def new_sha256():
+    """Create an OpenSSL-backed SHA-256 hasher (uses SHA-NI / ARMv8 SHA2 when available)"""
+    # Checksums only guard against corrupt downloads, so the FIPS wrapper is not needed
+    return hashlib.new("sha256", usedforsecurity=False)
+
 def calculate_sha256(file_path):
     """Calculate SHA-256 checksum of a file"""
-    sha256_hash = hashlib.sha256()
     try:
         with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, new_sha256).hexdigest()
+            # Python < 3.11: reuse a single 1 MiB buffer instead of allocating per read
+            sha256_hash = new_sha256()
+            buf = memoryview(bytearray(HASH_CHUNK_SIZE))
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                sha256_hash.update(buf[:n])
         return sha256_hash.hexdigest()
     except Exception as e:
         print(f"{Fore.RED}Error calculating checksum for {file_path}: {e}{Style.RESET_ALL}")
         raise
 
-def verify_checksum(file_path, expected_sha256, file_name):
-    """Verify file checksum against expected value"""
+def read_cached_sha256(file_path):
+    """Return the digest recorded in the .sha256 sidecar of file_path if the file is unchanged since it was recorded"""
+    try:
+        with open(f"{file_path}.sha256") as f:
+            cached = json.load(f)
+        st = os.stat(file_path)
+        if cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def write_cached_sha256(file_path, sha256):
+    """Record a verified digest next to file_path so later runs can skip re-hashing it"""
+    try:
+        st = os.stat(file_path)
+        with open(f"{file_path}.sha256", "w") as f:
+            json.dump({"sha256": sha256, "size": st.st_size, "mtime_ns": st.st_mtime_ns}, f)
+    except OSError as e:
+        print(f"{Fore.YELLOW}Could not cache checksum for {file_path}: {e}{Style.RESET_ALL}")
+
+def verify_checksum(file_path, expected_sha256, file_name, actual_sha256=None):
+    """Verify file checksum against expected value, hashing the file unless a digest is given or cached"""
     try:
         print(f"{Fore.YELLOW}Verifying {file_name} checksum...{Style.RESET_ALL}")
-        actual_sha256 = calculate_sha256(file_path)
+        if actual_sha256 is None:
+            actual_sha256 = read_cached_sha256(file_path)
+        if actual_sha256 is None:
+            actual_sha256 = calculate_sha256(file_path)
         if actual_sha256 == expected_sha256:
             print(f"{Fore.GREEN}{file_name} checksum verification passed{Style.RESET_ALL}")
+            if os.path.isfile(file_path):
+                write_cached_sha256(file_path, actual_sha256)
             return True
         else:
             print(f"{Fore.RED}{file_name} checksum verification failed!{Style.RESET_ALL}")
@@ -106,22 +186,30 @@ def build_native_binaries(ghidra_dir, jdk_home):
         env['JAVA_HOME'] = jdk_home
         env['PATH'] = f"{os.path.join(jdk_home, 'bin')}:{env.get('PATH', '')}"
         
-        # Change to gradle directory and run buildNatives
-        result = subprocess.run(
+        # Change to gradle directory and run buildNatives, streaming its output as it is produced
+        # Only the tail of the log is kept for the failure report
+        output_tail = deque(maxlen=GRADLE_LOG_TAIL_LINES)
+        with subprocess.Popen(
             ["./gradlew", "buildNatives"],
             cwd=gradle_dir,
             env=env,
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode == 0:
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1
+        ) as process:
+            for line in process.stdout:
+                print(line, end='')
+                output_tail.append(line)
+        returncode = process.returncode
+
+        if returncode == 0:
             print(f"{Fore.GREEN}Native binaries built successfully!{Style.RESET_ALL}")
             return True
         else:
-            print(f"{Fore.RED}Gradle build failed with return code {result.returncode}{Style.RESET_ALL}")
-            print(f"{Fore.RED}STDOUT: {result.stdout}{Style.RESET_ALL}")
-            print(f"{Fore.RED}STDERR: {result.stderr}{Style.RESET_ALL}")
+            print(f"{Fore.RED}Gradle build failed with return code {returncode}{Style.RESET_ALL}")
+            print(f"{Fore.RED}Last {len(output_tail)} lines of output:{Style.RESET_ALL}")
+            print(f"{Fore.RED}{''.join(output_tail)}{Style.RESET_ALL}")
             return False
             
     except Exception as e:
@@ -130,13 +218,135 @@ def build_native_binaries(ghidra_dir, jdk_home):
 
 def add_execute_permissions(file_path):
     try:
-        subprocess.run(["chmod", "+x", file_path], check=True)
+        st = os.stat(file_path)
+        os.chmod(file_path, st.st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
         print(f"{Fore.GREEN}Added execute permissions to {file_path}{Style.RESET_ALL}")
-    except subprocess.CalledProcessError as e:
+    except OSError as e:
         print(f"{Fore.RED}Error adding execute permissions to {file_path}: {e}{Style.RESET_ALL}")
         raise
 
-def download_file(url, dest, expected_sha256=None, file_name=None):
+def probe_range_support(url):
+    """Return the length of url if the server accepts byte ranges for it, otherwise None"""
+    response = http.request('HEAD', url)
+    if response.status != 200:
+        return None
+    if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+        return None
+    # Segments request the original url: redirect targets such as GitHub's signed asset URLs expire,
+    # and a resumed segment may come long after the probe
+    return int(response.headers.get('Content-Length') or 0) or None
+
+def download_range(url, fd, start, end, progress, stop):
+    """Download bytes start..end (inclusive) of url and write them at the same offset of fd, until stop is set"""
+    offset = start
+    failures = 0
+    while True:
+        # The pool only retries until the headers arrive, so a dropped body resumes from offset here
+        error = None
+        try:
+            response = http.request('GET', url, headers={'Range': f'bytes={offset}-{end}'}, preload_content=False)
+            try:
+                if response.status == 200:
+                    raise Exception("Server ignored the range request and sent the whole file")
+                if response.status != 206:
+                    raise Exception(f"HTTP {response.status} while downloading bytes {offset}-{end} of {url}")
+                for chunk in response.stream(DOWNLOAD_CHUNK_SIZE, decode_content=False):
+                    check_cancelled()
+                    if stop.is_set():
+                        raise Exception("Download aborted")
+                    view = memoryview(chunk)
+                    while view:
+                        written = os.pwrite(fd, view, offset)
+                        view = view[written:]
+                        offset += written
+                    progress.update(len(chunk))
+            finally:
+                response.release_conn()
+        except urllib3.exceptions.HTTPError as e:
+            error = e
+        if offset == end + 1:
+            return
+        failures += 1
+        if failures > RANGE_SEGMENT_RETRIES:
+            raise Exception(f"Incomplete range {start}-{end}: got {offset - start} bytes ({error})")
+        # Back off, but wake up straight away if another segment has already failed
+        if stop.wait(failures):
+            raise Exception("Download aborted")
+
+def download_segmented(url, dest, length, position=None):
+    """Download url to dest with parallel HTTP Range requests; returns the SHA-256 of the file"""
+    segment_size = -(-length // RANGE_DOWNLOAD_SEGMENTS)
+    ranges = [(start, min(start + segment_size, length) - 1) for start in range(0, length, segment_size)]
+    fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, length)
+        with tqdm(total=length, unit='B', unit_scale=True, miniters=1, desc=url.split('/')[-1], position=position) as t:
+            stop = threading.Event()
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(download_range, url, fd, start, end, t, stop) for start, end in ranges]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    # One failed segment fails the file, so stop the others instead of finishing the download
+                    stop.set()
+                    executor.shutdown(cancel_futures=True)
+                    raise
+    finally:
+        os.close(fd)
+    # Segments arrive out of order, so the file can only be hashed once it is complete
+    return calculate_sha256(dest)
+
+def download_stream(url, dest, position=None):
+    """Download url to dest over a single connection; returns the SHA-256 of the file"""
+    # Hash the bytes as they arrive so verification does not re-read the file
+    sha256_hash = new_sha256()
+    response = http.request('GET', url, preload_content=False)
+    try:
+        if response.status != 200:
+            raise Exception(f"HTTP {response.status} while downloading {url}")
+        total = int(response.headers.get('Content-Length') or 0) or None
+        # Progress is counted by the wrapped write(), once per chunk
+        # bytes=False: wrapattr would otherwise force 1024-based units, unlike the other bars
+        with open(dest, 'wb') as f, tqdm.wrapattr(f, 'write', total=total, bytes=False, unit='B', unit_scale=True,
+                                                  miniters=1, desc=url.split('/')[-1], position=position) as out_file:
+            for chunk in response.stream(DOWNLOAD_CHUNK_SIZE, decode_content=False):
+                check_cancelled()
+                out_file.write(chunk)
+                sha256_hash.update(chunk)
+    finally:
+        response.release_conn()
+    return sha256_hash.hexdigest()
+
+class HashingReader:
+    """Read-only file wrapper that hashes (and reports progress for) everything read through it"""
+
+    def __init__(self, fileobj, progress=None, copy_to=None):
+        self.fileobj = fileobj
+        self.progress = progress
+        self.copy_to = copy_to
+        self.sha256_hash = new_sha256()
+
+    def read(self, size=-1):
+        check_cancelled()
+        data = self.fileobj.read(size)
+        self.sha256_hash.update(data)
+        if self.copy_to is not None:
+            self.copy_to.write(data)
+        if self.progress is not None:
+            self.progress.update(len(data))
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def hexdigest(self):
+        return self.sha256_hash.hexdigest()
+
+def download_file(url, dest, expected_sha256=None, file_name=None, position=None):
+    """Download url to dest, hashing it on the fly; returns the SHA-256 of the file"""
     if os.path.exists(dest):
         print(f"{Fore.YELLOW}{dest} already exists, skipping download{Style.RESET_ALL}")
         # Verify existing file if checksum is provided
@@ -145,88 +355,309 @@ def download_file(url, dest, expected_sha256=None, file_name=None):
                 print(f"{Fore.YELLOW}Existing file failed checksum verification, re-downloading...{Style.RESET_ALL}")
                 os.remove(dest)
             else:
-                return
+                return expected_sha256
+    # Download under a temporary name so a failed or cancelled run never leaves a truncated dest behind
+    part_path = f"{dest}.part"
     try:
         print(f"{Fore.YELLOW}Downloading {url} to {dest}{Style.RESET_ALL}")
 
-        with tqdm(unit='B', unit_scale=True, miniters=1, desc=url.split('/')[-1]) as t:
-            def reporthook(blocknum, blocksize, totalsize):
-                t.total = totalsize
-                t.update(blocknum * blocksize - t.n)
+        # Large files are split across several connections when the server supports byte ranges
+        length = probe_range_support(url)
+        if length and length >= RANGE_DOWNLOAD_MIN_SIZE:
+            actual_sha256 = download_segmented(url, part_path, length, position)
+        else:
+            actual_sha256 = download_stream(url, part_path, position)
 
-            urllib.request.urlretrieve(url, dest, reporthook)
-        
         # Verify downloaded file if checksum is provided
         if expected_sha256 and file_name:
-            if not verify_checksum(dest, expected_sha256, file_name):
+            if not verify_checksum(dest, expected_sha256, file_name, actual_sha256):
                 raise Exception(f"Downloaded {file_name} failed checksum verification")
-    except Exception as e:
+        os.replace(part_path, dest)
+        if expected_sha256 and file_name:
+            write_cached_sha256(dest, actual_sha256)
+        return actual_sha256
+    except BaseException as e:
+        if os.path.exists(part_path):
+            os.remove(part_path)
         print(f"{Fore.RED}Error downloading {url}: {e}{Style.RESET_ALL}")
         raise
 
+def zip_member_path(dest_dir, name):
+    """Destination path of a zip member, dropping absolute and '..' components like ZipFile does"""
+    parts = [part for part in name.split('/') if part not in ('', '.', '..')]
+    return os.path.join(dest_dir, *parts)
+
+def extract_zip_members(file_path, names, dest_dir):
+    """Extract a batch of members; runs in a worker process with its own handle on the archive"""
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        for name in names:
+            with zip_ref.open(name) as src, open(zip_member_path(dest_dir, name), 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
 def extract_zip(file_path, dest_dir):
     try:
         print(f"{Fore.YELLOW}Extracting {file_path} to {dest_dir}{Style.RESET_ALL}")
         with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(dest_dir)
+            members = zip_ref.infolist()
+
+        # Create the whole directory tree up front so the workers never race on os.makedirs
+        file_names = []
+        for info in members:
+            if info.is_dir():
+                os.makedirs(zip_member_path(dest_dir, info.filename), exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(zip_member_path(dest_dir, info.filename)), exist_ok=True)
+                file_names.append(info.filename)
+
+        # Inflating each member is independent CPU work, so spread the members over all cores.
+        # A few batches per core keep cancellation prompt without reopening the archive per member.
+        workers = os.cpu_count() or 1
+        batch_count = workers * 4
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_zip_members, file_path, file_names[i::batch_count], dest_dir)
+                       for i in range(batch_count)]
+            try:
+                for future in futures:
+                    future.result()
+                    check_cancelled()
+            except Exception:
+                # Drop the batches that have not started yet
+                executor.shutdown(cancel_futures=True)
+                raise
     except Exception as e:
         print(f"{Fore.RED}Error extracting {file_path}: {e}{Style.RESET_ALL}")
         raise
 
+def extract_tar_members(tar_ref, dest_dir):
+    """Extract every member of an open tar archive, copying regular files through a large buffer"""
+    directories = []
+    for member in tar_ref:
+        check_cancelled()
+        # Same safety rules as extractall(filter='data'); raises on unsafe members
+        member = tarfile.data_filter(member, dest_dir)
+        target = os.path.join(dest_dir, member.name)
+        if member.isdir():
+            os.makedirs(target, exist_ok=True)
+            directories.append(member)
+        elif member.isfile():
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with tar_ref.extractfile(member) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            if member.mode is not None:
+                os.chmod(target, member.mode)
+            os.utime(target, (member.mtime, member.mtime))
+        else:
+            # Links keep tarfile's own handling
+            tar_ref.extract(member, dest_dir, filter='data')
+    # Apply directory modes last so a read-only directory cannot block its own contents
+    for member in reversed(directories):
+        if member.mode is not None:
+            os.chmod(os.path.join(dest_dir, member.name), member.mode)
+
+def open_tar_gz_stream(fileobj):
+    """Open a .tar.gz stream for sequential reading, using ISA-L for decompression when installed"""
+    if igzip is not None:
+        return tarfile.open(fileobj=igzip.IGzipFile(fileobj=fileobj, mode='rb'), mode='r|')
+    return tarfile.open(fileobj=fileobj, mode='r|gz')
+
 def extract_tar_gz(file_path, dest_dir):
     try:
         print(f"{Fore.YELLOW}Extracting {file_path} to {dest_dir}{Style.RESET_ALL}")
-        with tarfile.open(file_path, 'r:gz') as tar_ref:
-            tar_ref.extractall(dest_dir, filter='data')
+        # A large read buffer lets the stream-mode reader pull the archive in big sequential reads
+        with open(file_path, 'rb', buffering=TAR_READ_BUFFER_SIZE) as f, open_tar_gz_stream(f) as tar_ref:
+            extract_tar_members(tar_ref, dest_dir)
     except Exception as e:
         print(f"{Fore.RED}Error extracting {file_path}: {e}{Style.RESET_ALL}")
         raise
 
-def main():
-    try:
-        # Create Ghidra.app as an empty directory first.
-        subprocess.run(["osacompile", "-o", app_dir, applet_path], check=True)
-        print(f"{Fore.GREEN}Created Ghidra.app at {app_dir}{Style.RESET_ALL}")
-
-        # Step 2: Download and extract the latest OpenJDK
-        jdk_tar_path = os.path.join(temp_dir, "openjdk.tar.gz")
-        download_file(java_url, jdk_tar_path, java_expected_sha256, "OpenJDK")
-        # Clean the jdk directory before extraction to avoid permission issues
-        if os.path.exists(jdk_dir):
-            shutil.rmtree(jdk_dir)
-        os.makedirs(jdk_dir, exist_ok=True)
-        extract_tar_gz(jdk_tar_path, jdk_dir)
-        jdk_extracted_dir = os.path.join(jdk_dir, os.listdir(jdk_dir)[0])
+def download_and_extract_tar_gz(url, dest_dir, expected_sha256=None, file_name=None, position=None, archive_path=None):
+    """Stream a .tar.gz from url straight into dest_dir, also saving it to archive_path if given; returns its SHA-256"""
+    # Written under a temporary name so an interrupted run never leaves a truncated archive behind
+    part_path = f"{archive_path}.part" if archive_path else None
+    try:
+        print(f"{Fore.YELLOW}Downloading and extracting {url} to {dest_dir}{Style.RESET_ALL}")
+        response = http.request('GET', url, preload_content=False, decode_content=False)
+        copy_to = open(part_path, 'wb') if part_path else None
+        try:
+            if response.status != 200:
+                raise Exception(f"HTTP {response.status} while downloading {url}")
+            total = int(response.headers.get('Content-Length') or 0) or None
+            with tqdm(total=total, unit='B', unit_scale=True, miniters=1, desc=url.split('/')[-1], position=position) as t:
+                reader = HashingReader(response, t, copy_to)
+                with open_tar_gz_stream(reader) as tar_ref:
+                    extract_tar_members(tar_ref, dest_dir)
+                # tarfile stops at the end-of-archive marker, the trailing padding is part of the checksum too
+                while reader.read(DOWNLOAD_CHUNK_SIZE):
+                    pass
+        finally:
+            if copy_to is not None:
+                copy_to.close()
+            response.release_conn()
+        actual_sha256 = reader.hexdigest()
+
+        # The tree is already on disk by now, so roll it back if the archive turns out to be bad
+        if expected_sha256 and file_name:
+            if not verify_checksum(url, expected_sha256, file_name, actual_sha256):
+                shutil.rmtree(dest_dir, ignore_errors=True)
+                raise Exception(f"Downloaded {file_name} failed checksum verification")
+        if part_path:
+            os.replace(part_path, archive_path)
+            write_cached_sha256(archive_path, actual_sha256)
+        return actual_sha256
+    except BaseException as e:
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
+        print(f"{Fore.RED}Error downloading and extracting {url}: {e}{Style.RESET_ALL}")
+        raise
+
+def fetch_tar_gz(url, archive_path, dest_dir, expected_sha256=None, file_name=None, position=None, keep_archive=False):
+    """Extract archive_path into dest_dir if it was kept before, otherwise stream it from url (saving it if keep_archive)"""
+    if os.path.exists(archive_path):
+        download_file(url, archive_path, expected_sha256, file_name, position)
+        extract_tar_gz(archive_path, dest_dir)
+    else:
+        download_and_extract_tar_gz(url, dest_dir, expected_sha256, file_name, position,
+                                    archive_path if keep_archive else None)
+
+def make_staging_dir(name):
+    """Create an empty staging directory next to the final location of name inside the app bundle"""
+    staging_dir = os.path.join(resources_dir, f".{name}.new")
+    # Leftover from an interrupted run
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+    return staging_dir
+
+def install_extracted_tree(staging_dir, final_dir):
+    """Move the top-level directory extracted into staging_dir to final_dir"""
+    extracted_dir = os.path.join(staging_dir, os.listdir(staging_dir)[0])
+    # staging_dir lives next to final_dir, so this is a single rename(2) instead of a copy
+    try:
+        os.replace(extracted_dir, final_dir)
+    except OSError:
+        # rename(2) does not overwrite a non-empty directory, so drop the previous install and retry
+        if not os.path.isdir(final_dir):
+            raise
+        shutil.rmtree(final_dir)
+        os.replace(extracted_dir, final_dir)
+
+def check_free_space(path, required_bytes):
+    """Return True if the filesystem holding path has at least required_bytes free"""
+    free_bytes = shutil.disk_usage(path).free
+    if free_bytes < required_bytes:
+        print(f"{Fore.RED}Not enough free disk space in {path}: "
+              f"{free_bytes / 1024 ** 3:.1f} GiB available, {required_bytes / 1024 ** 3:.1f} GiB required{Style.RESET_ALL}")
+        return False
+    return True
+
+def remove_archive(archive_path):
+    """Delete a downloaded archive and its checksum sidecar once its contents are installed"""
+    for path in (archive_path, f"{archive_path}.sha256"):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"{Fore.GREEN}Removed {archive_path}{Style.RESET_ALL}")
+
+def compile_applet():
+    """Compile the launcher AppleScript into Ghidra.app, unless the bundle was built from the same script"""
+    applet_sha256 = calculate_sha256(applet_path)
+    if os.path.isdir(app_dir) and os.path.exists(applet_digest_path):
+        with open(applet_digest_path) as f:
+            if f.read().strip() == applet_sha256:
+                print(f"{Fore.YELLOW}{app_dir} is up to date, skipping osacompile{Style.RESET_ALL}")
+                return
+    subprocess.run(["osacompile", "-o", app_dir, applet_path], check=True)
+    with open(applet_digest_path, "w") as f:
+        f.write(applet_sha256)
+    print(f"{Fore.GREEN}Created Ghidra.app at {app_dir}{Style.RESET_ALL}")
+
+def extract_jdk_into_bundle(jdk_tar_path, keep_archives=False):
+    """Download and extract the OpenJDK into the app bundle; returns its final location"""
+    # Staging, extraction and cleanup run in one thread, so the staging dir is never removed under a running extract
+    jdk_staging_dir = make_staging_dir("jdk")
+    try:
+        # The JDK tarball is extracted while it downloads
+        fetch_tar_gz(java_url, jdk_tar_path, jdk_staging_dir, java_expected_sha256, "OpenJDK", 0, keep_archives)
         # Place JDK in the correct location within the app bundle
-        jdk_final_app_dir = os.path.join(app_dir, "Contents", "Resources", "jdk")
-        # Remove existing jdk directory if it exists
-        if os.path.exists(jdk_final_app_dir):
-            shutil.rmtree(jdk_final_app_dir)
-        shutil.copytree(jdk_extracted_dir, jdk_final_app_dir)
+        jdk_final_app_dir = os.path.join(resources_dir, "jdk")
+        install_extracted_tree(jdk_staging_dir, jdk_final_app_dir)
+        # Only present when an earlier run kept it
+        if not keep_archives and os.path.exists(jdk_tar_path):
+            remove_archive(jdk_tar_path)
+    finally:
+        shutil.rmtree(jdk_staging_dir, ignore_errors=True)
+    return jdk_final_app_dir
+
+def extract_ghidra_into_bundle(ghidra_zip_path, keep_archives=False):
+    """Extract the downloaded Ghidra zip into the app bundle; returns its final location"""
+    check_cancelled()
+    ghidra_staging_dir = make_staging_dir("ghidra")
+    try:
+        extract_zip(ghidra_zip_path, ghidra_staging_dir)
+        # Place Ghidra in the correct location within the app bundle
+        ghidra_final_app_dir = os.path.join(resources_dir, "ghidra")
+        install_extracted_tree(ghidra_staging_dir, ghidra_final_app_dir)
+        # Free the space before the Gradle build needs it
+        if not keep_archives:
+            remove_archive(ghidra_zip_path)
+    finally:
+        shutil.rmtree(ghidra_staging_dir, ignore_errors=True)
+    return ghidra_final_app_dir
+
+async def install_jdk(applet_task, keep_archives=False):
+    """JDK pipeline: wait for the app bundle, then stream the OpenJDK into it"""
+    jdk_tar_path = os.path.join(temp_dir, "openjdk.tar.gz")
+    # The staging directory lives inside the app bundle, so the bundle has to exist first
+    await applet_task
+    return await asyncio.to_thread(extract_jdk_into_bundle, jdk_tar_path, keep_archives)
+
+async def install_ghidra(applet_task, keep_archives=False):
+    """Ghidra pipeline: download the zip, then extract it into the app bundle"""
+    ghidra_zip_path = os.path.join(temp_dir, "ghidra.zip")
+    await asyncio.to_thread(download_file, ghidra_url, ghidra_zip_path, ghidra_expected_sha256, "Ghidra", 1)
+    await applet_task
+    return await asyncio.to_thread(extract_ghidra_into_bundle, ghidra_zip_path, keep_archives)
+
+async def install_bundle(keep_archives=False):
+    """Build Ghidra.app, overlapping the applet compile, both downloads and the extractions"""
+    # Create Ghidra.app as an empty directory first.
+    applet_task = asyncio.create_task(asyncio.to_thread(compile_applet))
+    # OpenJDK and Ghidra are served by different hosts, so each pipeline runs on its own
+    jdk_task = asyncio.create_task(install_jdk(applet_task, keep_archives))
+    ghidra_task = asyncio.create_task(install_ghidra(applet_task, keep_archives))
+    try:
+        return await asyncio.gather(jdk_task, ghidra_task)
+    except BaseException:
+        # Also covers Ctrl-C, which reaches here as CancelledError. Worker threads cannot be cancelled,
+        # so tell both pipelines to stop at their next chunk instead of finishing the downloads.
+        install_cancelled.set()
+        raise
+
+def main(keep_archives=False):
+    # Fail before the downloads rather than halfway through the extraction
+    if not check_free_space(temp_dir, REQUIRED_FREE_BYTES):
+        exit()
+
+    try:
+        # Steps 1-3: Create the app bundle, then download and extract the latest OpenJDK and Ghidra into it
+        jdk_final_app_dir, ghidra_final_app_dir = asyncio.run(install_bundle(keep_archives))
+
+    except KeyboardInterrupt:
+        # A second Ctrl-C while the workers wind down lands here too: don't let a stalled thread hold up the exit
+        install_cancelled.set()
+        # Normally removed by the download helpers, but a stalled worker may still hold one
+        for name in os.listdir(temp_dir):
+            if name.endswith(".part"):
+                os.remove(os.path.join(temp_dir, name))
+        print(f"{Fore.RED}Installation cancelled{Style.RESET_ALL}", flush=True)
+        os._exit(130)
 
     except Exception as e:
         print(f"{Fore.RED}Installation failed: {e}{Style.RESET_ALL}")
         exit()
 
     try:
-        # Step 3: Download and extract the latest Ghidra
-        ghidra_zip_path = os.path.join(temp_dir, "ghidra.zip")
-        download_file(ghidra_url, ghidra_zip_path, ghidra_expected_sha256, "Ghidra")
-        # Clean the ghidra directory before extraction to avoid permission issues
-        if os.path.exists(ghidra_dir):
-            shutil.rmtree(ghidra_dir)
-        os.makedirs(ghidra_dir, exist_ok=True)
-        extract_zip(ghidra_zip_path, ghidra_dir)
-        ghidra_extracted_dir = os.path.join(ghidra_dir, os.listdir(ghidra_dir)[0])
-        # Place Ghidra in the correct location within the app bundle
-        ghidra_final_app_dir = os.path.join(app_dir, "Contents", "Resources", "ghidra")
-        # Remove existing ghidra directory if it exists
-        if os.path.exists(ghidra_final_app_dir):
-            shutil.rmtree(ghidra_final_app_dir)
-        shutil.copytree(ghidra_extracted_dir, ghidra_final_app_dir)
-
         # Step 4: Build native binaries using Gradle
-        jdk_home = os.path.join(app_dir, "Contents", "Resources", "jdk", "Contents", "Home")
+        jdk_home = os.path.join(jdk_final_app_dir, "Contents", "Home")
         if not build_native_binaries(ghidra_final_app_dir, jdk_home):
             print(f"{Fore.YELLOW}Warning: Native binary build failed, but continuing with installation...{Style.RESET_ALL}")
 
@@ -241,5 +672,9 @@ def main():
         exit()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Install Ghidra as a self-contained macOS app")
+    parser.add_argument("--keep-archives", action="store_true",
+                        help="keep the downloaded archives after extraction so later runs can reuse them")
+    args = parser.parse_args()
     print_banner()
-    main()
+    main(keep_archives=args.keep_archives)